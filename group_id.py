@@ -4,14 +4,18 @@ group_id.py - Penny Lane Bot Module
 Handles the actual Telegram bot functionality for group ID retrieval
 """
 
+import asyncio
 import logging
 import time
 import os
 import hashlib
-from collections import defaultdict
+import tempfile
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
+from cachetools import TTLCache
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 
 # Configure logging
 DEBUG_MODE = os.getenv("PENNY_DEBUG", "false").lower() == "true"
@@ -31,53 +35,145 @@ logger = logging.getLogger(__name__)
 if not DEBUG_MODE:
     logging.getLogger('httpx').setLevel(logging.WARNING)
 
-# ---- Ephemeral in-memory store (RAM only) ----
+# ---- In-memory store (only owner IDs are persisted, to OWNERS_PATH) ----
 owners = set()                                    # User IDs who started bot privately
-recent_groups = defaultdict(lambda: 0.0)         # {group_id: expiry_timestamp} - clearer than defaultdict(float)
-user_last_request = defaultdict(lambda: 0.0)     # {user_id: last_request_timestamp} for rate limiting
+OWNERS_PATH = Path("owners.log")                  # Append-only log of owner user IDs, one per line
+_unpersisted_owners = set()                       # Owner IDs whose append to OWNERS_PATH failed, retried later
 TTL = 300           # 5 minutes in seconds
 RATE_LIMIT = 30     # 30 seconds between requests per user
+CACHE_MAXSIZE = 10000   # Upper bound on entries per cache, oldest evicted first
+recent_groups = TTLCache(maxsize=CACHE_MAXSIZE, ttl=TTL)             # {group_id: True}, expires after TTL
+user_last_request = TTLCache(maxsize=CACHE_MAXSIZE, ttl=RATE_LIMIT)  # {user_id: last_request_timestamp} for rate limiting
+SEND_RATE_LIMIT = 25    # Max outgoing messages per second (Telegram's global cap is 30)
+GIF_PATH = Path("success.gif")
+_gif_bytes = None   # success.gif contents, loaded once and reused for every send
+_send_times = deque(maxlen=SEND_RATE_LIMIT)     # Timestamps of the most recent outgoing sends
+_send_lock = None   # asyncio.Lock guarding _send_times, created on first use inside the event loop
 
+@lru_cache(maxsize=4096)
 def encrypt_id(id_value):
     """Encrypt sensitive IDs for logging"""
     # Use SHA-256 hash and truncate to 8 characters for logging
     hash_obj = hashlib.sha256(str(id_value).encode())
     return hash_obj.hexdigest()[:8]
 
-def prune_expired():
-    """Remove expired group records and old rate limit entries from memory."""
-    now = time.time()
-    
-    # Clean expired group records
-    expired_groups = [gid for gid, exp in recent_groups.items() if exp <= now]
-    for gid in expired_groups:
-        del recent_groups[gid]
+async def _load_gif(application):
+    """post_init hook: read success.gif into memory once, off the event loop"""
+    global _gif_bytes
+    if GIF_PATH.exists():
+        _gif_bytes = await asyncio.to_thread(GIF_PATH.read_bytes)
+        logger.debug(f"Loaded {GIF_PATH} ({len(_gif_bytes):,} bytes)")
+    else:
+        logger.warning("success.gif not found, notifications will be text-only")
+
+def _load_owners():
+    """Restore owners from OWNERS_PATH and compact the log to one sorted ID per line"""
+    if not OWNERS_PATH.exists():
+        return
+    try:
+        tokens = OWNERS_PATH.read_text().split()
+    except OSError as e:
+        logger.error("Could not read owners from %s: %s", OWNERS_PATH, e)
+        return
     
-    # Clean old rate limit entries (older than 1 hour)
-    old_requests = [uid for uid, timestamp in user_last_request.items() if now - timestamp > 3600]
-    for uid in old_requests:
-        del user_last_request[uid]
+    # Parse each entry separately so one bad line (e.g. a torn append) doesn't drop the rest
+    for token in tokens:
+        try:
+            owners.add(int(token))
+        except ValueError:
+            logger.warning("Skipping malformed entry in %s", OWNERS_PATH)
+    logger.info("Restored %d registered owners from %s", len(owners), OWNERS_PATH)
     
-    if expired_groups or old_requests:
-        logger.info(f"Pruned {len(expired_groups)} expired group records and {len(old_requests)} old rate limit entries")
+    # Compact via a temp file + atomic replace so a crash never leaves the log empty
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=OWNERS_PATH.parent, prefix=f".{OWNERS_PATH.name}.")
+        with os.fdopen(fd, "w") as f:
+            f.write("".join(f"{owner_id}\n" for owner_id in sorted(owners)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, OWNERS_PATH)
+    except OSError as e:
+        logger.error("Could not compact %s: %s", OWNERS_PATH, e)
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+def _append_owners(owner_ids):
+    """Append newly registered owner IDs to OWNERS_PATH (created owner-only, 0o600)"""
+    fd = os.open(OWNERS_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "a") as f:
+        f.write("".join(f"{owner_id}\n" for owner_id in owner_ids))
+
+async def _wait_for_send_slot():
+    """Sleep until sending another message keeps us under SEND_RATE_LIMIT per second"""
+    global _send_lock
+    if _send_lock is None:
+        _send_lock = asyncio.Lock()
+    async with _send_lock:
+        now = time.monotonic()
+        if len(_send_times) == SEND_RATE_LIMIT and now - _send_times[0] < 1.0:
+            await asyncio.sleep(1.0 - (now - _send_times[0]))
+            now = time.monotonic()
+        _send_times.append(now)
+
+async def _send_to_owner(bot, owner_id, text, markup, gif_bytes):
+    """Send a group ID notification to one owner, returning True on success"""
+    try:
+        # Try to send with GIF first
+        await _wait_for_send_slot()
+        if gif_bytes is not None:
+            await bot.send_animation(
+                chat_id=owner_id,
+                animation=InputFile(gif_bytes, filename=GIF_PATH.name),
+                caption=text,
+                parse_mode="Markdown",
+                reply_markup=markup
+            )
+        else:
+            # Fallback to text-only if GIF not found
+            await bot.send_message(
+                chat_id=owner_id,
+                text=text,
+                parse_mode="Markdown",
+                reply_markup=markup
+            )
+            logger.warning("success.gif not found, sent text-only message")
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to send to owner {owner_id}: {e}")
+        # Try fallback text message if GIF fails
+        try:
+            await _wait_for_send_slot()
+            await bot.send_message(
+                chat_id=owner_id,
+                text=text,
+                parse_mode="Markdown"
+            )
+            return True
+        except Exception as e2:
+            logger.error(f"Both GIF and text failed for owner {owner_id}: {e2}")
+            return False
 
 async def bandaid_command(update, context):
     """Handle /bandaid command in private chats and groups."""
-    prune_expired()
-    
     chat = update.effective_chat
     user = update.effective_user
     
-    # Debug logging with encrypted IDs
-    encrypted_user_id = encrypt_id(user.id)
-    encrypted_chat_id = encrypt_id(chat.id)
-    logger.debug(f"Received /bandaid from user #{encrypted_user_id} in chat #{encrypted_chat_id} (type: {chat.type})")
+    # Debug logging with encrypted IDs (skip hashing entirely unless debug is on)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Received /bandaid from user #%s in chat #%s (type: %s)",
+                     encrypt_id(user.id), encrypt_id(chat.id), chat.type)
     
     # Rate limiting check
     now = time.time()
-    if now - user_last_request[user.id] < RATE_LIMIT:
-        remaining = int(RATE_LIMIT - (now - user_last_request[user.id]))
-        logger.info(f"Rate limit hit for user #{encrypted_user_id}, {remaining}s remaining")
+    last_request = user_last_request.get(user.id, 0.0)
+    if now - last_request < RATE_LIMIT:
+        remaining = int(RATE_LIMIT - (now - last_request))
+        logger.info("Rate limit hit for user #%s, %ss remaining", encrypt_id(user.id), remaining)
         await update.message.reply_text(
             f"⏰ Please wait {remaining} seconds before using this command again."
         )
@@ -87,9 +183,20 @@ async def bandaid_command(update, context):
     
     if chat.type == "private":
         # Register user for private notifications
-        owners.add(user.id)
-        logger.info(f"Registered new owner: #{encrypted_user_id} (@{user.username or 'no_username'})")
-        logger.debug(f"Total registered owners: {len(owners)}")
+        if user.id not in owners:
+            owners.add(user.id)
+            _unpersisted_owners.add(user.id)
+            logger.info("Registered new owner: #%s (@%s)", encrypt_id(user.id), user.username or 'no_username')
+        
+        # Persist this owner plus any whose earlier append failed, so none are lost on restart
+        if _unpersisted_owners:
+            pending = sorted(_unpersisted_owners)
+            try:
+                await asyncio.to_thread(_append_owners, pending)
+                _unpersisted_owners.difference_update(pending)
+            except OSError as e:
+                logger.warning("Could not persist %d owner(s) to %s: %s", len(pending), OWNERS_PATH, e)
+        logger.debug("Total registered owners: %d", len(owners))
         
         await update.message.reply_text(
             "🎸 Hey there! I'm Penny Lane, your group ID band aid.\n\n"
@@ -97,26 +204,31 @@ async def bandaid_command(update, context):
             "1. Add me as an admin to any group you manage\n"
             "2. Send /bandaid in that group\n"
             "3. I'll privately message you the group's ID\n"
-            "4. I forget everything after 5 minutes for your privacy!\n\n"
+            "4. I forget group info after 5 minutes; your registration is saved "
+            "so you stay signed up across restarts\n\n"
             "Ready when you are! 🎵"
         )
         return
     
     if chat.type in {"group", "supergroup"}:
-        logger.debug(f"Processing group request - Group: {chat.title} (#{encrypted_chat_id})")
+        if debug:
+            logger.debug("Processing group request - Group: %s (#%s)", chat.title, encrypt_id(chat.id))
         
         # Check if user is actually an admin
         try:
             member = await context.bot.get_chat_member(chat.id, user.id)
-            logger.debug(f"User #{encrypted_user_id} status in group: {member.status}")
+            if debug:
+                logger.debug("User #%s status in group: %s", encrypt_id(user.id), member.status)
             if member.status not in ["creator", "administrator"]:
-                logger.info(f"Non-admin #{encrypted_user_id} tried to use /bandaid in group #{encrypted_chat_id}")
+                logger.info("Non-admin #%s tried to use /bandaid in group #%s",
+                            encrypt_id(user.id), encrypt_id(chat.id))
                 await update.message.reply_text(
                     "Sorry, only group admins can use this command."
                 )
                 return
         except Exception as e:
-            logger.warning(f"Could not verify admin status for #{encrypted_user_id} in #{encrypted_chat_id}: {e}")
+            logger.warning("Could not verify admin status for #%s in #%s: %s",
+                           encrypt_id(user.id), encrypt_id(chat.id), e)
             # For security, deny access if we can't verify admin status
             await update.message.reply_text(
                 "Unable to verify admin status. Please ensure I have proper permissions."
@@ -125,7 +237,8 @@ async def bandaid_command(update, context):
         
         # Only send ID if we haven't already sent it recently
         if chat.id not in recent_groups:
-            logger.debug(f"New group request for #{encrypted_chat_id}, sending to {len(owners)} owners")
+            if debug:
+                logger.debug("New group request for #%s, sending to %d owners", encrypt_id(chat.id), len(owners))
             
             # Send group ID to all registered owners with GIF
             message_text = (
@@ -136,56 +249,26 @@ async def bandaid_command(update, context):
                 f"This info will be forgotten in 5 minutes."
             )
             
-            success_count = 0
-            for owner_id in owners:
-                try:
-                    # Create inline keyboard with donation button
-                    keyboard = [[
-                        InlineKeyboardButton(
-                            "🎵 Support the music", 
-                            callback_data="donate_stars"
-                        )
-                    ]]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    # Try to send with GIF first
-                    gif_path = Path("success.gif")
-                    if gif_path.exists():
-                        with open(gif_path, 'rb') as gif_file:
-                            await context.bot.send_animation(
-                                chat_id=owner_id,
-                                animation=gif_file,
-                                caption=message_text,
-                                parse_mode="Markdown",
-                                reply_markup=reply_markup
-                            )
-                    else:
-                        # Fallback to text-only if GIF not found
-                        await context.bot.send_message(
-                            chat_id=owner_id,
-                            text=message_text,
-                            parse_mode="Markdown",
-                            reply_markup=reply_markup
-                        )
-                        logger.warning("success.gif not found, sent text-only message")
-                    
-                    success_count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to send to owner {owner_id}: {e}")
-                    # Try fallback text message if GIF fails
-                    try:
-                        await context.bot.send_message(
-                            chat_id=owner_id,
-                            text=message_text,
-                            parse_mode="Markdown"
-                        )
-                        success_count += 1
-                    except Exception as e2:
-                        logger.error(f"Both GIF and text failed for owner {owner_id}: {e2}")
+            # Create inline keyboard with donation button (same for every owner)
+            keyboard = [[
+                InlineKeyboardButton(
+                    "🎵 Support the music", 
+                    callback_data="donate_stars"
+                )
+            ]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            # Notify all owners concurrently; one failure doesn't affect the others
+            results = await asyncio.gather(
+                *[_send_to_owner(context.bot, owner_id, message_text, reply_markup, _gif_bytes)
+                  for owner_id in owners],
+                return_exceptions=True
+            )
+            success_count = sum(1 for r in results if r is True)
             
             # Remember this group temporarily
-            recent_groups[chat.id] = time.time() + TTL
-            logger.info(f"Sent group ID #{encrypted_chat_id} to {success_count} owners")
+            recent_groups[chat.id] = True
+            logger.info("Sent group ID #%s to %d owners", encrypt_id(chat.id), success_count)
             
             await update.message.reply_text(
                 f"✅ Group ID sent privately to {success_count} registered admin(s)!"
@@ -207,8 +290,8 @@ async def help_command(update, context):
         "3. Send /bandaid in that group\n"
         "4. I'll DM you the group ID\n\n"
         "**Privacy & Security:**\n"
-        "• RAM-only storage (nothing saved to disk)\n"
-        "• 5-minute automatic data expiry\n"
+        "• Group IDs kept in RAM only (never saved to disk)\n"
+        "• 5-minute automatic group data expiry\n"
         "• Admin-only access verification\n"
         "• Rate limiting (30s between requests)\n\n"
         "**Commands:**\n"
@@ -224,8 +307,6 @@ async def status_command(update, context):
     if update.effective_chat.type != "private":
         return
     
-    prune_expired()
-    
     status_text = (
         f"🎵 **Penny Lane Status**\n\n"
         f"👥 Registered owners: {len(owners)}\n"
@@ -233,7 +314,7 @@ async def status_command(update, context):
         f"⏱️ Cache TTL: {TTL} seconds\n"
         f"🛡️ Rate limit: {RATE_LIMIT} seconds\n"
         f"🧠 Active rate limits: {len(user_last_request)}\n\n"
-        f"All data is stored in RAM only and automatically expires!"
+        f"Group data is stored in RAM only and automatically expires!"
     )
     
     await update.message.reply_text(status_text, parse_mode="Markdown")
@@ -273,8 +354,11 @@ async def error_handler(update, context):
 
 def run_bot(token):
     """Run the bot with the given token"""
+    # Restore owners registered before the last restart
+    _load_owners()
+    
     # Create application
-    application = Application.builder().token(token).build()
+    application = Application.builder().token(token).post_init(_load_gif).build()
     
     # Add command handlers
     application.add_handler(CommandHandler("bandaid", bandaid_command))
@@ -294,7 +378,7 @@ def run_bot(token):
     application.add_error_handler(error_handler)
     
     logger.info("🎸 Penny Lane is starting up...")
-    logger.info("🔒 Privacy mode: RAM-only storage with 5-minute expiry")
+    logger.info("🔒 Privacy mode: RAM-only group storage with 5-minute expiry")
     logger.info("🛡️ Security: Rate limiting and enhanced validation enabled")
     logger.info("📡 Bot is now polling for updates...")
     
@@ -308,4 +392,4 @@ def run_bot(token):
         logger.error(f"💥 Bot crashed: {e}")
         return 1
     finally:
-        logger.info("🧹 All data cleared from memory")
+        logger.info("🧹 Group data cleared from memory")
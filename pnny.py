@@ -11,6 +11,7 @@ Usage:
 
 import sys
 import platform
+import re
 import logging
 import time
 import os
@@ -18,6 +19,12 @@ import subprocess
 import getpass
 from pathlib import Path
 
+# Telegram bot token: numeric bot ID (8+ digits), colon, auth token (20+ URL-safe chars)
+_TOKEN_RE = re.compile(r'[0-9]{8,}:[A-Za-z0-9_-]{20,}')
+
+# .env line: KEY=value (comments and blank lines never match)
+_ENV_LINE_RE = re.compile(r'^[ \t]*([A-Za-z_][A-Za-z0-9_]*)=(.*?)[ \t\r]*$', re.M)
+
 def activate_venv():
     """Activate the virtual environment by modifying sys.path"""
     venv_path = Path("venv")
@@ -42,33 +49,15 @@ def activate_venv():
         print(f"❌ Site-packages not found at: {site_packages_path}")
         return False
 
+def _load_env(path):
+    """Parse a .env file in one pass and export its variables to os.environ"""
+    env = dict(_ENV_LINE_RE.findall(path.read_text()))
+    os.environ.update(env)
+    return env
+
 def validate_bot_token(token):
     """Validate bot token format for security"""
-    if not token or not isinstance(token, str):
-        return False
-    
-    # Basic format validation for Telegram bot tokens
-    if ':' not in token:
-        return False
-        
-    parts = token.split(':')
-    if len(parts) != 2:
-        return False
-    
-    # First part should be bot ID (numeric)
-    bot_id, auth_token = parts
-    if not bot_id.isdigit() or len(bot_id) < 8:
-        return False
-        
-    # Second part should be auth token (alphanumeric + some special chars)
-    if len(auth_token) < 20:
-        return False
-    
-    # Bot IDs typically start with certain digits
-#    if not bot_id.startswith(('1', '2', '5', '6', '7')):
- #       return False
-        
-    return True
+    return isinstance(token, str) and _TOKEN_RE.fullmatch(token) is not None
 
 def first_time_setup():
     """Handle first-time setup: venv, dependencies, token"""
@@ -104,7 +93,7 @@ def first_time_setup():
     try:
         subprocess.run(pip_cmd + ["install", "--upgrade", "pip"], 
                       check=True, capture_output=True)
-        subprocess.run(pip_cmd + ["install", "python-telegram-bot==21.0.1"], 
+        subprocess.run(pip_cmd + ["install", "python-telegram-bot==21.0.1", "cachetools==5.3.3"], 
                       check=True, capture_output=True)
         print("✅ Requirements installed")
         
@@ -208,20 +197,8 @@ def self_check():
         return False
     print("✅ Configuration file found")
     
-    # Load and check token
+    # Check token (.env has already been loaded into the environment by main)
     token = os.getenv("PENNY_BOT_TOKEN")
-    if not token:
-        try:
-            with open(env_file) as f:
-                for line in f:
-                    if line.startswith("PENNY_BOT_TOKEN="):
-                        token = line.split("=", 1)[1].strip()
-                        os.environ["PENNY_BOT_TOKEN"] = token
-                        break
-        except Exception as e:
-            print(f"❌ Error reading .env file: {e}")
-            return False
-    
     if not validate_bot_token(token):
         print("❌ Bot token not configured or invalid format")
         return False
@@ -238,6 +215,13 @@ def self_check():
         print("❌ Telegram library missing - run with --setup")
         return False
     
+    try:
+        import cachetools
+        print("✅ cachetools library available")
+    except ImportError:
+        print("❌ cachetools library missing - run with --setup")
+        return False
+    
     # Check GIF
     gif_path = Path("success.gif")
     if gif_path.exists():
@@ -284,12 +268,7 @@ def main():
     # Load environment variables
     if env_file.exists():
         try:
-            with open(env_file) as f:
-                for line in f:
-                    line = line.strip()
-                    if line and '=' in line and not line.startswith('#'):
-                        key, value = line.split('=', 1)
-                        os.environ[key] = value
+            _load_env(env_file)
         except Exception as e:
             print(f"⚠️  Warning: Error reading .env file: {e}")
     
@@ -318,6 +297,7 @@ def main():
         return group_id.run_bot(token)
     except ImportError as e:
         print(f"❌ Failed to import bot module: {e}")
+        print("   Missing dependencies? Run: python pnny.py --setup")
         print("   Debug info:")
         print(f"   - group_id.py exists: {Path('group_id.py').exists()}")
         print(f"   - venv exists: {Path('venv').exists()}")